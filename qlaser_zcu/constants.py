@@ -1,6 +1,12 @@
 # Constants for the FPGA. Most of these are based on both firmware and hardware from BOOT.bin
 UART_BAUD_DEFAULT = 115200
 UART_DESCIP_KWD = "Interface 0"  # Keyword to search for UART interface
+UART_LATENCY_TIMER = 1  # USB-serial adapter latency timer in ms
+UART_CHUNK_SIZE = 4096  # Maximum bytes per serial write for bulk transfers
+UART_SETTLE_TIME = 0.05  # Seconds of silence on the serial port that ends a read-out of its buffer. Well above the default 16 ms USB latency timer
+UART_WRITE_TIMEOUT = 5  # Seconds before a blocked serial write raises
+UART_RX_BUF_SIZE = 1 << 20  # OS serial RX buffer size in bytes, holds a whole wave table or pulse definition read-out (Windows only)
+UART_TX_BUF_SIZE = 1 << 16  # OS serial TX buffer size in bytes (Windows only)
 
 FPGA_VERSION = "3AC10001"  #FPGA version
 FIRMWARE_VERSION = "1.0.k"  # Firmware version
@@ -24,6 +30,8 @@ C_MAX_CHANNELS = 32
 C_ERR_BITS = 8
 BIT_FRAC = 8
 BIT_FRAC_GAIN = C_BITS_GAIN_FACTOR - 1
+SCALE_GAIN = 1 << BIT_FRAC_GAIN  # Fixed-point value of a gain factor of 1.0
+SCALE_TIME = 1 << BIT_FRAC  # Fixed-point value of a time factor of 1.0
 PULSE_START_MIN = 5  # Minimum start time for pulse
 
 # Configuration
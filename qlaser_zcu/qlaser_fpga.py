@@ -1,11 +1,37 @@
+import os
+import sys
+import time
 import serial
 import serial.tools.list_ports
 import json
-from .constants import *  # noqa: F403
+import numpy as np
+from .constants import (
+    UART_BAUD_DEFAULT, UART_DESCIP_KWD, UART_LATENCY_TIMER, UART_CHUNK_SIZE, UART_SETTLE_TIME, UART_WRITE_TIMEOUT, UART_RX_BUF_SIZE, UART_TX_BUF_SIZE,
+    FPGA_VERSION, FIRMWARE_VERSION,
+    C_LENGTH_WAVEFORM, C_NUM_WAVEFORM, C_BITS_ADDR_WAVE, C_MAX_CHANNELS,
+    SCALE_GAIN, SCALE_TIME, PULSE_START_MIN,
+    CMD_VERSIONS, CMD_REG_DUMP, CMD_ECHO, CMD_RESET, CMD_MEM_CLR, CMD_PULSE_SEQ,
+    CMD_PULSE_CHEN, CMD_PULSE_CHSEL, CMD_RD_WAVE, CMD_RD_PDEFN,
+    CMD_PDEFN_WR, CMD_WAVERAM_WR, CMD_DC_WR, CMD_WAVERAM_RD, CMD_CH_ERR, CMD_ERR_MSG,
+)
 from serial.serialutil import SerialException
-from typing import TypedDict
+from typing import Sequence, TypedDict
 from loguru import logger
 
+# Upper limits of the pulse definition fields checked by entry_pulse_defn, in the order of its arguments
+_PDEFN_LIMITS = (
+    ("Start time", 0x00FFFFFF),
+    ("Scale Gain", 0xFFFF),
+    ("Scale addr", 0xFFFF),
+    ("Flattop",    0x0001FFFF),
+)
+
+# Fixed command messages, encoded once at import
+_MSG_ECHO_OFF  = b"0" + CMD_ECHO          # Turn off command echo
+_MSG_CHSEL_ALL = b"99" + CMD_PULSE_CHSEL  # Select all channels
+_MSG_CLR_PDEFN = b"0" + CMD_MEM_CLR       # Clear pulse definitions of the selected channel(s)
+_MSG_CLR_WAVE  = b"1" + CMD_MEM_CLR       # Clear waveform table of the selected channel(s)
+
 class VersionsMismatchException(Exception):
     """Exception raised when versions do not match"""
 
@@ -31,42 +57,48 @@ class QlaserFPGA:
         Args:
             portname (str, optional): Serial port to FPGA. Defaults to None to automatically select.
             baudrate (int, optional): Baudrate of the serial interface. Defaults to 115200.
+            skip_version_check (bool, optional): Skip reading and checking the versions of a port not checked before in this process. Defaults to False.
 
         Raises:
             SerialException: No valid UART COM port found or given
         """
-    def __init__(self, portname : str=None, baudrate: int=UART_BAUD_DEFAULT):
+    _port_versions: dict[str, str] = {}  # versions already checked per port, the bitstream does not change while the program runs
+    _port_state: dict[str, dict] = {}  # hardware state last set per port, shared by every connection to it as the FPGA holds it once
+
+    def __init__(self, portname : str=None, baudrate: int=UART_BAUD_DEFAULT, skip_version_check: bool = False):
         self.logger = logger
                 
-        comlist = (list(serial.tools.list_ports.comports()))
-        if portname:
-            self.ser = serial.Serial(
-                port = portname,\
-                baudrate=baudrate,\
-                parity=serial.PARITY_NONE,\
-                stopbits=serial.STOPBITS_ONE,\
-                bytesize=serial.EIGHTBITS,\
-                timeout=1)
-        elif len(comlist) > 0:
-            for i in comlist:
-                if "Interface 0" in i.description:        
-                    portname = i[0]
+        if not portname:
+            for i in serial.tools.list_ports.comports():
+                if UART_DESCIP_KWD in i.description:
+                    portname = i.device
+                    self.logger.debug(f"Found serial port: {portname}")
                     break
             else:
-                raise SerialException("No valid UART COM port found")
-            self.ser = serial.Serial(
-                port = portname,\
-                baudrate=115200,\
-                parity=serial.PARITY_NONE,\
-                stopbits=serial.STOPBITS_ONE,\
-                bytesize=serial.EIGHTBITS,\
-                timeout=1)
-            self.logger.debug(f"Found and connected to serial port: {portname}")
-        else:
-            raise SerialException("No ports found or given!")
+                raise SerialException("No valid UART COM port found or given!")
+        self.ser = self._open_serial(portname, baudrate)
+        self._set_low_latency()
+        # last selected channel (None when unknown or all channels are selected), last enabled channel mask
+        # and next free pulse entry of the selected channel (None when unknown)
+        self._state = self._port_state.setdefault(portname, {"chsel": None, "chen": None, "next_entry": None})
+        
+        # check version, once per port
+        self.vers = self._port_versions.get(portname, "")
+        if not (self.vers or skip_version_check):
+            self.vers = ", ".join(self.versions())
+            self._check_versions()
+            self._port_versions[portname] = self.vers
+        
+        # Turn off command echo
+        self.ser.write(_MSG_ECHO_OFF)
         
-        # check version
-        self.vers = ", ".join(self.versions())
+    def _check_versions(self) -> None:
+        """Check the versions read from the FPGA against the ones this package is written for.
+
+        Raises:
+            SerialException: No versions received
+            VersionsMismatchException: Versions do not match
+        """
         if not (FPGA_VERSION in self.vers and FIRMWARE_VERSION in self.vers):
             self.logger.error(f"Version integrity check failed!\nExpected FPGA: {FPGA_VERSION}, Firmware: {FIRMWARE_VERSION}\nFound: {self.vers}")
             if not self.vers:
@@ -74,26 +106,118 @@ class QlaserFPGA:
             else:
                 raise VersionsMismatchException((f"\n!!!Versions Mismatch! Please reload the bitsteam!!!\n!!!Incorrect version will result wrong bahavior!!!"))
         
-        # Turn off command echo
-        self.ser.write('0'.encode('utf-8') + CMD_ECHO)
-        
     
-    def print_all(self, errors: str = "ignore", type="debug"):
-        """Read and print all data from the serial port
+    def __enter__(self) -> "QlaserFPGA":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the serial connection to the FPGA"""
+        self.ser.close()
+        self.logger.debug(f"Closed serial port: {self.ser.port}")
+
+    def _open_serial(self, portname: str, baudrate: int) -> serial.Serial:
+        """Open the serial port to the FPGA with the settings used by the firmware
 
         Args:
-            errors (str, optional): How errors are handled when decoding the serial message. Defaults to "ignore".
-            type (str, optional): Type of log message. Either "info" or "debug". Defaults to "debug".
+            portname (str): Serial port to open
+            baudrate (int): Baudrate of the serial interface
+
+        Returns:
+            serial.Serial: Opened serial port
+        """
+        ser = serial.Serial(
+            port=portname,
+            baudrate=baudrate,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            bytesize=serial.EIGHTBITS,
+            timeout=1,
+            write_timeout=UART_WRITE_TIMEOUT)
+        try:
+            ser.set_buffer_size(rx_size=UART_RX_BUF_SIZE, tx_size=UART_TX_BUF_SIZE)  # only available on Windows
+        except AttributeError:
+            pass
+        self.logger.debug(f"Connected to serial port: {portname}")
+        return ser
+
+    def _set_low_latency(self) -> None:
+        """Lower the USB-serial adapter's latency timer so short responses are not held back for the default 16 ms.
+        Sets the ``ASYNC_LOW_LATENCY`` flag of the port and the ``latency_timer`` sysfs attribute of the adapter.
+        Only supported on Linux. Silently skipped where the driver or platform does not support it.
         """
+        if not sys.platform.startswith("linux"):
+            return
+        try:
+            self.ser.set_low_latency_mode(True)  # TIOCGSERIAL/TIOCSSERIAL ioctl pair
+            self.logger.debug(f"Enabled low latency mode on {self.ser.port}")
+        except (AttributeError, ValueError) as e:
+            self.logger.debug(f"Could not enable low latency mode on {self.ser.port}: {e}")
+        tty = os.path.basename(os.path.realpath(self.ser.port))
+        try:
+            with open(f"/sys/bus/usb-serial/devices/{tty}/latency_timer", "w") as f:
+                f.write(str(UART_LATENCY_TIMER))
+            self.logger.debug(f"Set latency timer of {tty} to {UART_LATENCY_TIMER} ms")
+        except OSError as e:
+            self.logger.debug(f"Could not set latency timer of {tty}: {e}")
+    
+    def _drain_all(self, errors: str = "replace", wait: bool = False) -> list[str]:
+        """Read all data from the serial port in bulk until the port stays quiet for `UART_SETTLE_TIME` seconds.
+
+        Args:
+            errors (str, optional): How errors are handled when decoding the serial message. Defaults to "replace".
+            wait (bool, optional): Wait up to the port timeout for the first byte, for responses to a command just sent. Defaults to False.
+
+        Returns:
+            list[str]: Received lines
+        """
+        ser = self.ser
+        data = bytearray(ser.read(1) if wait else b"")
+        quiet_since = time.monotonic()
+        while time.monotonic() - quiet_since < UART_SETTLE_TIME:
+            n_waiting = ser.in_waiting
+            if n_waiting:
+                data += ser.read(n_waiting)
+                quiet_since = time.monotonic()
+            else:
+                time.sleep(0.001)
+        return data.decode('utf-8', errors=errors).splitlines()
+
+    def _read_line(self) -> bytes:
+        """Read one long response line in bulk. ``Serial.readline`` fetches a single byte per call, this reads all available bytes at once.
+        Anything received after the line ending is discarded, so only use it when a single response line is expected.
+
+        Returns:
+            bytes: Received line, empty if nothing arrived within the port timeout
+        """
+        ser = self.ser
+        data = bytearray()
         while True:
-            data = self.ser.readline()
-            if not data:
+            chunk = ser.read(ser.in_waiting or 1)  # blocks up to the port timeout when nothing is buffered
+            data += chunk
+            if not chunk or b"\n" in chunk:
                 break
-            msg = data.decode('utf-8', errors=errors).strip()
+        return bytes(data.partition(b"\n")[0])
+
+    def print_all(self, errors: str = "ignore", type="debug", wait: bool = False):
+        """Read and print all data from the serial port.
+        Buffered data is read in bulk until the port stays quiet for `UART_SETTLE_TIME` seconds.
+
+        Args:
+            errors (str, optional): How errors are handled when decoding the serial message. Defaults to "ignore".
+            type (str, optional): Type of log message. Either "info", "debug" or "none" to drain without logging (errors are still logged). Defaults to "debug".
+            wait (bool, optional): Wait up to the port timeout for the first byte. Set it after a command the FPGA replies to, so the reply is not left for the next reader. Defaults to False to only clear what is already buffered.
+        """
+        log_fn = None if type == "none" else getattr(self.logger, type)
+        err_fn = self.logger.error
+        for line in self._drain_all(errors=errors, wait=wait):
+            msg = line.strip()
             if CMD_ERR_MSG in msg:
-                self.logger.error(msg)
-            else:
-                eval(f"self.logger.{type}")(msg)
+                err_fn(msg)
+            elif log_fn:
+                log_fn(msg)
 
     def versions(self) -> list[str]:
         """Read and print all versions from the serial port
@@ -102,62 +226,87 @@ class QlaserFPGA:
             list[str]: List of all versions
         """
         self.ser.write(CMD_VERSIONS)
-        dumps = []
-        data = self.ser.readlines()
+        data = self._drain_all(wait=True)
         if not data:
             self.logger.error("No data received! Please make sure the device is powered on and running valid bitstream.")
-        for i in data:
-            dumps.append(i.decode('utf-8', errors="replace").strip())
-        return dumps
+        return [i.strip() for i in data]
 
     def reset(self, flush_type: str="debug"):
         """Soft reset data in the FPGA and reset pulse entry counter to 0
         
         Args:
-            flush_type (str, optional): Type of log message. Either "info" or "debug". Defaults to "debug".
+            flush_type (str, optional): Type of log message. Either "info", "debug" or "none". Defaults to "debug".
         """
         self.ser.write(CMD_RESET)
         self.logger.debug("Sent soft reset command to FPGA")
+        self._state.update(chsel=None, chen=None, next_entry=None)
         
-        self.print_all(type=flush_type)  # Clear the buffer
+        self.print_all(type=flush_type, wait=True)  # Clear the buffer
         
         
-    def xil_out32(self, addr: int, data: int, cmd: int | bytes) -> None:
+    def xil_out32(self, addr: int, data: int, cmd: bytes, buf: bytearray | None = None, flush: bool = False) -> None:
         """Mimic Xil_Out32(addr, value) from the original C code but for specific block. 
         A generic write to a FPGA's memory location by writing 32-bit data and 16-bit address with a block-specific command.
 
         Args:
             addr (int): Address to write to
             data (int): Data to write
-            cmd (int): Write operation command, in hex format. This specifies the block to write to.
+            cmd (bytes): Write operation command, one of the `CMD_*` bytes. This specifies the block to write to.
+            buf (bytearray | None, optional): Append the message to this buffer instead of sending it, to be sent later with :meth:`write_batch`. Defaults to None to send immediately.
+            flush (bool, optional): Read out the FPGA's response with :meth:`print_all` after sending. Leave off for writes in a batch and flush once at the end. Defaults to False.
             
         Examples:
-            Write 0x1234 to address 0x5678 in the pulse definition RAM (cmd = 0x8A)
-            >>> xil_out32(0x5678, 0x1234, 0x8A)
+            Write 0x1234 to address 0x5678 in the pulse definition RAM
+            >>> xil_out32(0x5678, 0x1234, CMD_PDEFN_WR)
         """
+        frame = self._frame_out32(addr, data, cmd)
+        if buf is None:
+            self.ser.write(frame)
+            if flush:
+                self.print_all(type="debug", wait=True)
+        else:
+            buf += frame
 
-        if isinstance(cmd, int):
-            cmd = bytes([cmd])
-            
-        self.ser.write(str(((addr & 0xFFFF) << 32) | (data & 0xFFFFFFFF)).encode('utf-8') + cmd)
+    def write_batch(self, buf: bytes | bytearray) -> None:
+        """Send messages collected with the ``buf`` argument of the write methods in a single transfer.
+        Large buffers are split into writes of at most `UART_CHUNK_SIZE` bytes to stay within the OS serial buffer.
+
+        Args:
+            buf (bytes | bytearray): Messages to send
+        """
+        write = self.ser.write
+        view = memoryview(buf)
+        for i in range(0, len(view), UART_CHUNK_SIZE):
+            write(view[i:i + UART_CHUNK_SIZE])
+        self.ser.flush()  # wait until sent so a following print_all sees the responses
+
+    def _frame_out32(self, addr: int, data: int, cmd: bytes) -> bytes:
+        """Build the serial message of :meth:`xil_out32` without sending it, so several writes can be sent in one transfer.
+
+        Args:
+            addr (int): Address to write to
+            data (int): Data to write
+            cmd (bytes): Write operation command, one of the `CMD_*` bytes. This specifies the block to write to.
+
+        Returns:
+            bytes: Message to send over the serial port
+        """
+        return b"%d" % (((addr & 0xFFFF) << 32) | (data & 0xFFFFFFFF)) + cmd
         
-    def xil_in32(self, addr: int, cmd: int | bytes) -> int:
+    def xil_in32(self, addr: int, cmd: bytes) -> int:
         """Mimic Xil_In32(addr) from the original C code but for specific block. 
         A generic read from a a FPGA's memory location by writing 16-bit address with a block-specific command and reading 32-bit data.
         
         Args:
             addr (int): Address to read from
-            cmd (int): Read operation command, in hex format. This specifies the block to read from.
+            cmd (bytes): Read operation command, one of the `CMD_*` bytes. This specifies the block to read from.
         
         Returns:
             int: Data read from the address
         """
-        
-        if type(cmd) == int:
-            cmd = bytes([cmd])
         # flush out any existing data in the buffer
         self.print_all(type="debug")
-        self.ser.write(str(addr).encode('utf-8') + cmd)
+        self.ser.write(b"%d" % addr + cmd)
         data = self.ser.readline().decode('utf-8', errors="replace").strip()
         return int(data)
     
@@ -169,26 +318,23 @@ class QlaserFPGA:
         """
         self.print_all(type="debug")  # clear the buffer
         self.ser.write(CMD_REG_DUMP)
-        dumps = []
-        for i in self.ser.readlines():
-            dumps.append(i.decode('utf-8', errors="replace").strip())
-        return dumps
+        return [i.strip() for i in self._drain_all(wait=True)]
     
     def read_errs(self) -> None:
         """Check channel errors. Print error message if any.
         """
         self.print_all(type="debug")  # clear the buffer
         self.ser.write(CMD_CH_ERR)
-        erros = json.loads(self.ser.readline().decode('utf-8', errors="replace").strip())
+        erros = json.loads(self.ser.readline())  # json parses the raw bytes and ignores the line ending
         cnt_err = 0
-        for k, v in erros.items():
-            erro_type = k
-            erro_chan = bin(v)[2:].zfill(C_MAX_CHANNELS)
-    
-            for j, char in enumerate(erro_chan):
-                if char == '1':
-                    logger.error(f"Found {erro_type} violation on channel {C_MAX_CHANNELS - j - 1}")
-                    cnt_err += 1
+        for erro_type, erro_chan in erros.items():
+            erro_chan &= (1 << C_MAX_CHANNELS) - 1  # a mask printed as signed is negative when channel 31 is set
+            # visit only the set bits of the channel mask, lowest channel first
+            while erro_chan:
+                ch = (erro_chan & -erro_chan).bit_length() - 1
+                logger.error(f"Found {erro_type} violation on channel {ch}")
+                cnt_err += 1
+                erro_chan &= erro_chan - 1
         if cnt_err == 0:
             logger.info("No channel errors found")
         else:
@@ -199,10 +345,10 @@ class QlaserFPGA:
 
         Args:
             seq_length (int): Total duration of the pulse sequence
-            flush_type (str, optional): Type of log message. Either "info" or "debug". Defaults to "debug".
+            flush_type (str, optional): Type of log message. Either "info", "debug" or "none". Defaults to "debug".
         """
-        self.ser.write(f'{seq_length}'.encode('utf-8') + CMD_PULSE_SEQ)
-        self.print_all(type=flush_type)
+        self.ser.write(b"%d" % seq_length + CMD_PULSE_SEQ)
+        self.print_all(type=flush_type, wait=True)
         
     def read_en(self) -> list[int]:
         """Read enabled channels
@@ -212,18 +358,23 @@ class QlaserFPGA:
         """
         self.print_all(type="debug")  # clear the buffer
         self.ser.write(CMD_REG_DUMP)
-        data = self.ser.readlines()
+        data = self._drain_all(wait=True)
         
         for i in data:
-            if "ADR_PULSE_REG_CHEN" in str(i):
-                enabled = i.decode("utf-8").split("0x")[-1].strip()
+            if "ADR_PULSE_REG_CHEN" in i:
+                enabled = int(i.rpartition("0x")[2], 16)  # parse the hex value straight from the line
                 break
         else:
             logger.error("No ADR_PULSE_REG_CHEN register found in the response.")
             return
+        self._state["chen"] = enabled  # the hardware's value, so chan_en can skip a matching request
             
-        converted = bin(int(enabled, 16))[2:].zfill(32)[::-1]  # reverse the string to match channel order        
-        return [i for i, x in enumerate(converted) if x == "1"]
+        # visit only the set bits of the channel mask, lowest channel first
+        channels = []
+        while enabled:
+            channels.append((enabled & -enabled).bit_length() - 1)
+            enabled &= enabled - 1
+        return channels
         
         
     def chan_en(self, channels: int | list[int]) -> None:
@@ -245,9 +396,12 @@ class QlaserFPGA:
         if data == 0:
             logger.error("No Valid channels selected!")
             return
+        if data == self._state["chen"]:
+            return  # already enabled, skip the round-trip
             
-        self.ser.write(f'{data}'.encode('utf-8') + CMD_PULSE_CHEN)
-        self.print_all(type="debug")
+        self.ser.write(b"%d" % data + CMD_PULSE_CHEN)
+        self._state["chen"] = data
+        self.print_all(type="debug", wait=True)
         
     def chan_sel(self, channel: int) -> None:
         """Select a single channel (0-31) to configure.
@@ -258,29 +412,28 @@ class QlaserFPGA:
         if channel > C_MAX_CHANNELS or channel < 0:
             self.logger.error(f"Channel {channel} is out of range. Set back to 0")
             channel = 0
-        self.ser.write(f'{1 << channel}'.encode('utf-8') + CMD_PULSE_CHSEL)
-        self.print_all(type="debug")  # flush out serial buffer
-        
-    def write_dc_chan(self, ch: int, value: int) -> None:
+        if channel == self._state["chsel"]:
+            return  # already selected, skip the round-trip
+        self.ser.write(b"%d" % (1 << channel) + CMD_PULSE_CHSEL)
+        self._state["chsel"] = channel
+        self._state["next_entry"] = None  # the free entries of the new channel are unknown
+        self.print_all(type="debug", wait=True)  # flush out serial buffer
+        
+    def write_dc_chan(self, ch: int, value: int, flush: bool = True, buf: bytearray | None = None) -> None:
         """Write a value to DC channel
 
         Args:
             ch (int): Channel (0-31) to write to. 32 total. Zero-indexed.
             value (int): Value to write for selected channel
+            flush (bool, optional): Read out the FPGA's response after writing. Set to False when writing several channels in a row and call :meth:`print_all` once at the end. Ignored when `buf` is given. Defaults to True.
+            buf (bytearray | None, optional): Append the write to this buffer instead of sending it. See :meth:`write_batch`. Defaults to None to send immediately.
         """
         if ch >= C_MAX_CHANNELS or ch < 0:
             self.logger.error(f"Channel {ch} is out of range. Set back to 0")
             ch = 0
         
-        spi = int(ch / 8)
-        dac_channel = int(ch % 8)
-
-        # Format address
-        addr = (spi << 3) + dac_channel
-        
-        self.xil_out32(addr, value, CMD_DC_WR)
-        
-        self.print_all(type="debug")
+        # Address is the SPI DAC index (ch // 8) in bits 3+ and the DAC channel (ch % 8) in bits 0-2, which is ch itself
+        self.xil_out32(ch, value, CMD_DC_WR, buf, flush)
         
     def read_waves(self, addr: int) -> tuple[int, int]:
         """Read a pair of values from the wave table with a even-numbered start address
@@ -317,15 +470,13 @@ class QlaserFPGA:
         end_addr = start_addr + length
 
         self.print_all(type="debug")  # flush out serial buffer
-        self.ser.write(f'{(start_addr << 16) + end_addr}'.encode('utf-8') + CMD_RD_WAVE)
-        data = self.ser.readline().decode('utf-8', errors="replace").strip().split(",")
-            
-        values = []
-        for i in data:
-            if i.isdigit():
-                values.append(int(i))
+        self.ser.write(b"%d" % ((start_addr << 16) + end_addr) + CMD_RD_WAVE)
+        data = np.array(self._read_line().strip().split(b","), dtype=bytes)
         
-        return values
+        # parse every numeric token at once straight from the raw bytes, skipping empty or malformed ones
+        # and ones longer than a 32-bit value, e.g. two values run together, which would overflow the cast
+        valid = np.char.isdigit(data) & (np.char.str_len(data) <= 10)
+        return data[valid].astype(np.int64).tolist()
         
     def read_pulse_defn(self, n_entry: int = C_NUM_WAVEFORM, start: int = 0) -> list[PulseConfig]:
         """Read pulse definition from the FPGA. This is a list of pulse configurations.
@@ -349,35 +500,35 @@ class QlaserFPGA:
             start = 0
             n_entry = C_NUM_WAVEFORM
             
-        self.ser.write(f'{((4*(start)) << 16)+4*(n_entry)}'.encode('utf-8') + CMD_RD_PDEFN)
-        values = self.ser.readline().decode('utf-8', errors="replace").strip().split(",")
-        
-        configs = []
-        
-        # read values in a group of 4
-        for i in range(start, len(values), 4):
-            if all(values[i+j].isdigit() for j in range(4)):
-                start_time = int(values[i]) & 0x00FFFFFF
-                scale_gain = ((int(values[i+2]) >> 16) & 0xFFFF) / 2**BIT_FRAC_GAIN
-                scale_time = (int(values[i+2]) & 0xFFFF) / 2**BIT_FRAC
-                sustain = int(values[i+3]) & 0x0001FFFF
-
-                configs.append(PulseConfig(
-                    wave_id=int(values[i+1]),
-                    start_time=start_time,
-                    scale_gain=scale_gain,
-                    scale_time=scale_time,
-                    sustain=sustain
-                ))
-            
-        return configs
-        
-    def write_wave_table(self, start_addr: int, values: list[int], all_chan: bool = False) -> int:
+        self.ser.write(b"%d" % (((4*(start)) << 16)+4*(n_entry)) + CMD_RD_PDEFN)
+        values = self._read_line().strip().split(b",")
+        
+        # read values in a group of 4, a trailing incomplete group is dropped
+        tokens = np.array(values[start:], dtype=bytes)
+        groups = tokens[:len(tokens) // 4 * 4].reshape(-1, 4)
+        # parse all complete numeric groups at once and decode each field column in one pass
+        valid = np.char.isdigit(groups) & (np.char.str_len(groups) <= 10)  # 32-bit fields have at most 10 digits
+        groups = groups[valid.all(axis=1)].astype(np.int64)
+        start_times = groups[:, 0] & 0x00FFFFFF
+        wave_ids = groups[:, 1]
+        scale_gains = ((groups[:, 2] >> 16) & 0xFFFF) / SCALE_GAIN
+        scale_times = (groups[:, 2] & 0xFFFF) / SCALE_TIME
+        sustains = groups[:, 3] & 0x0001FFFF
+
+        return [
+            PulseConfig(wave_id=wave_id, start_time=start_time, scale_gain=scale_gain, scale_time=scale_time, sustain=sustain)
+            for start_time, wave_id, scale_gain, scale_time, sustain in zip(
+                start_times.tolist(), wave_ids.tolist(), scale_gains.tolist(), scale_times.tolist(), sustains.tolist()
+            )
+        ]
+        
+    def write_wave_table(self, start_addr: int, values: list[int] | np.ndarray, all_chan: bool = False) -> int:
         """Write two 16-bit integer value to the wave table starting at the given even-numbered address.
+        A wave of odd length is silently padded with a trailing 0 to fill the last pair.
 
         Args:
             start_addr (int): Starting address of the wave table
-            values (list[int]): List of values to be written
+            values (list[int] | np.ndarray): List or integer array of values to be written
             all_chan (bool, optional): Write to all channels. Note this will change the channel select and need to call `chan_sel` again  Defaults to False.
             
         Returns:
@@ -386,23 +537,34 @@ class QlaserFPGA:
         if bool(start_addr % 2):
             self.logger.error("Start address must be even!")
             return
+        # Build the whole message in one buffer and send it in one transfer instead of one write per pair
+        buf = bytearray()
         if all_chan:
             self.logger.debug("Writing same waveforms to all channels.")
-            self.ser.write('99'.encode('utf-8') + CMD_PULSE_CHSEL)
-        for i in range(start_addr, start_addr + len(values) - 1, 2):
-            self.write_waves(i, values[i-start_addr], values[i-start_addr+1])
-        # If the length of the values is odd, write the last value
-        if len(values) % 2:
-            self.write_waves(start_addr + len(values) - 1, values[-1], 0)
+            buf += _MSG_CHSEL_ALL
+            self._state["next_entry"] = self._state["chsel"] = None
+        # Round the buffer up to an even length so an odd-length wave is padded with a trailing 0
+        wave = np.zeros((len(values) + 1) & ~1, dtype=np.uint32)
+        wave[:len(values)] = values
+        # Pack every pair of 16-bit values into one 32-bit word and prepend its address in vectorized passes,
+        # leaving only the decimal formatting of each xil_out32 message per pair
+        words = (wave[1::2] << C_BITS_ADDR_WAVE) | wave[0::2]
+        addrs = (np.arange(len(words), dtype=np.uint64) + start_addr // 2) & 0xFFFF
+        frames = (addrs << 32) | words
+        cmd = CMD_WAVERAM_WR
+        buf += b"".join([b"%d%s" % (frame, cmd) for frame in frames.tolist()])
+        self.write_batch(buf)
+        self.print_all(type="debug", wait=True)  # drain the acknowledgements of the whole upload at once
         return (len(values) << 16) + (start_addr & 0x0FFF)
 
-    def write_waves(self, addr: int, val16_lo: int, val16_up: int) -> None:
+    def write_waves(self, addr: int, val16_lo: int, val16_up: int, buf: bytearray | None = None) -> None:
         """Write to wave table with fix-size of 2 values at given even-numbered address.
 
         Args:
             addr (int): Starting address of the wave table the data should be written to. 
             val16_lo (int): First value to be written
             val16_up (int): Second value to be written
+            buf (bytearray | None, optional): Append the write to this buffer instead of sending it. See :meth:`write_batch`. Defaults to None to send immediately.
         Examples:
             Write value 6 and 7 starting at address 6
             >>> write_waves(6, 6, 7)
@@ -411,7 +573,7 @@ class QlaserFPGA:
         if bool(addr % 2):
             self.logger.warning(f"Address {addr} is not even. Values may not be written correctly!")
 
-        self.xil_out32(addr32, val16_up * 2**C_BITS_ADDR_WAVE + val16_lo, CMD_WAVERAM_WR)
+        self.xil_out32(addr32, (val16_up << C_BITS_ADDR_WAVE) | val16_lo, CMD_WAVERAM_WR, buf)
 
     def entry_pulse_defn(self,
                         n_wave: int,
@@ -419,7 +581,8 @@ class QlaserFPGA:
                         n_scale_gain: float,
                         n_scale_time: float,
                         n_flattop: int,
-                        n_entry: int | None = None) -> None:
+                        n_entry: int | None = None,
+                        buf: bytearray | None = None) -> None:
         """Write pulse definition/parameters to the FPGA.
         Prints warnings if parameters exceed certain limits and
         Whenever this function gets called, a entry pointer increments by 1.
@@ -430,65 +593,116 @@ class QlaserFPGA:
             n_scale_gain (float): Amplitude scaling factor
             n_scale_time (float): Time step size
             n_flattop (int): Sustain time
-            n_entry (int | None, optional): Nth pulse entry. This value should and only be incremented by 1 every time this function is called. Defaults to None to auto allocate the next entry. Note that the automatic allocation will be slower than manually setting the entry, but it is more convenient.
+            n_entry (int | None, optional): Nth pulse entry. This value should and only be incremented by 1 every time this function is called. Defaults to None to auto allocate the next entry. Note that the first automatic allocation after selecting a channel reads back all pulse definitions, later ones follow the last written entry.
+            buf (bytearray | None, optional): Append the register writes to this buffer instead of sending them. See :meth:`write_batch`. Defaults to None to send immediately.
         """
         
+        if n_entry is None and self._state["next_entry"] is not None:
+            n_entry = self._state["next_entry"]  # follow the last written entry instead of reading the memory back
+            if n_entry >= C_NUM_WAVEFORM:
+                logger.warning("No empty entry found. Loop back and overwrite the first entry.")
+                n_entry = 0
         if n_entry is None:
             pdefs = self.read_pulse_defn()
-            for i in pdefs:
-                if sum(list(i.values())) == 0:
-                    n_entry = pdefs.index(i)
+            for i, pdef in enumerate(pdefs):
+                if not any(pdef.values()):
+                    n_entry = i
                     self.logger.debug(f"Found empty entry {n_entry} in pulse definition.")
                     break
             else:
                 logger.warning("No empty entry found. Loop back and overwrite the first entry.")
                 n_entry = 0
+        self._state["next_entry"] = n_entry + 1
         
-        n_scale_gain = int(n_scale_gain * 2**BIT_FRAC_GAIN)
-        n_scale_time = int(n_scale_time * 2**BIT_FRAC)
+        n_scale_gain = int(n_scale_gain * SCALE_GAIN)
+        n_scale_time = int(n_scale_time * SCALE_TIME)
         
         # Check bounds
-        if n_start_time > 0x00FFFFFF:
-            logger.warning(f"entry_pulse_defn({n_entry}): "
-                f"Start time 0x{n_start_time:06X} > 0x00FFFFFF")
+        for (name, limit), value in zip(_PDEFN_LIMITS, (n_start_time, n_scale_gain, n_scale_time, n_flattop)):
+            if value > limit:
+                logger.warning(f"entry_pulse_defn({n_entry}): {name} 0x{value:X} > 0x{limit:X}")
         if n_start_time < PULSE_START_MIN and n_entry == 0:
             logger.warning(f"entry_pulse_defn({n_entry}): "
                 f"Start time {n_start_time} < {PULSE_START_MIN}")
             logger.info(f"resetting to minimum {PULSE_START_MIN}")
             n_start_time = PULSE_START_MIN
 
-        if n_scale_gain > 0xFFFF:
-            logger.warning(f"entry_pulse_defn({n_entry}): "
-                f"Scale Gain 0x{n_scale_gain:04X} > 0xFFFF")
-
-        if n_scale_time > 0xFFFF:
-            logger.warning(f"entry_pulse_defn({n_entry}): "
-                f"Scale addr 0x{n_scale_time:04X} > 0xFFFF")
-
-        if n_flattop > 0x0001FFFF:
-            logger.warning(f"entry_pulse_defn({n_entry}): "
-                f"Flattop 0x{n_flattop:08X} > 0x0001FFFF")
-
-        # Compute and write registers
+        # Compute and write registers. The four writes go out in one transfer unless the caller batches them
+        out = bytearray() if buf is None else buf
         # 1) Write the Start Time
         n_wdata = n_start_time & 0x00FFFFFF
         n_waddr = 4 * n_entry  # offset calculation
-        self.xil_out32(n_waddr, n_wdata, CMD_PDEFN_WR)
+        self.xil_out32(n_waddr, n_wdata, CMD_PDEFN_WR, out)
 
         # 2) Write the Wave Length and Wave Address (basically the wave ID)
         n_wdata = n_wave
         n_waddr += 1
-        self.xil_out32(n_waddr, n_wdata, CMD_PDEFN_WR)
+        self.xil_out32(n_waddr, n_wdata, CMD_PDEFN_WR, out)
 
         # 3) Write the Scale Gain and Scale Address
         n_wdata = ((n_scale_gain & 0xFFFF) << 16) | (n_scale_time & 0xFFFF)
         n_waddr += 1
-        self.xil_out32(n_waddr, n_wdata, CMD_PDEFN_WR)
+        self.xil_out32(n_waddr, n_wdata, CMD_PDEFN_WR, out)
 
         # 4) Write the Flattop
         n_wdata = n_flattop & 0x0001FFFF
         n_waddr += 1
-        self.xil_out32(n_waddr, n_wdata, CMD_PDEFN_WR)
+        self.xil_out32(n_waddr, n_wdata, CMD_PDEFN_WR, out)
+
+        if buf is None:
+            self.write_batch(out)
+
+    def entry_pulse_defn_bulk(self,
+                              n_waves: Sequence[int] | np.ndarray,
+                              n_start_times: Sequence[int] | np.ndarray,
+                              n_scale_gains: Sequence[float] | np.ndarray,
+                              n_scale_times: Sequence[float] | np.ndarray,
+                              n_flattops: Sequence[int] | np.ndarray,
+                              n_entry: int = 0,
+                              buf: bytearray | None = None) -> None:
+        """Write many consecutive pulse definitions to the FPGA at once. Vectorized version of :meth:`entry_pulse_defn` taking one sequence per parameter.
+        All entries are checked and encoded with NumPy and sent in one transfer.
+
+        Args:
+            n_waves (Sequence[int] | np.ndarray): Wave IDs of the waveforms.
+            n_start_times (Sequence[int] | np.ndarray): Start times of the pulses. Minimum is 5.
+            n_scale_gains (Sequence[float] | np.ndarray): Amplitude scaling factors
+            n_scale_times (Sequence[float] | np.ndarray): Time step sizes
+            n_flattops (Sequence[int] | np.ndarray): Sustain times
+            n_entry (int, optional): Pulse entry of the first definition. The following definitions go to the following entries. Defaults to 0.
+            buf (bytearray | None, optional): Append the register writes to this buffer instead of sending them. See :meth:`write_batch`. Defaults to None to send immediately.
+        """
+        waves = np.asarray(n_waves, dtype=np.int64)
+        start_times = np.array(n_start_times, dtype=np.int64)
+        scale_gains = (np.asarray(n_scale_gains, dtype=np.float64) * SCALE_GAIN).astype(np.int64)
+        scale_times = (np.asarray(n_scale_times, dtype=np.float64) * SCALE_TIME).astype(np.int64)
+        flattops = np.asarray(n_flattops, dtype=np.int64)
+        self._state["next_entry"] = n_entry + len(waves)
+
+        # Check bounds
+        for (name, limit), values in zip(_PDEFN_LIMITS, (start_times, scale_gains, scale_times, flattops)):
+            for i in np.flatnonzero(values > limit).tolist():
+                logger.warning(f"entry_pulse_defn({n_entry + i}): {name} 0x{int(values[i]):X} > 0x{limit:X}")
+        if n_entry == 0 and len(start_times) and start_times[0] < PULSE_START_MIN:
+            logger.warning(f"entry_pulse_defn({n_entry}): "
+                f"Start time {start_times[0]} < {PULSE_START_MIN}")
+            logger.info(f"resetting to minimum {PULSE_START_MIN}")
+            start_times[0] = PULSE_START_MIN
+
+        # Compute the four registers of every entry, same layout as entry_pulse_defn
+        n_wdata = np.empty((len(waves), 4), dtype=np.int64)
+        n_wdata[:, 0] = start_times & 0x00FFFFFF
+        n_wdata[:, 1] = waves & 0xFFFFFFFF
+        n_wdata[:, 2] = ((scale_gains & 0xFFFF) << 16) | (scale_times & 0xFFFF)
+        n_wdata[:, 3] = flattops & 0x0001FFFF
+        n_waddr = np.arange(4 * n_entry, 4 * (n_entry + len(waves)), dtype=np.int64) & 0xFFFF
+        frames = (n_waddr << 32) | n_wdata.ravel()
+
+        out = bytearray() if buf is None else buf
+        cmd = CMD_PDEFN_WR
+        out += b"".join([b"%d%s" % (frame, cmd) for frame in frames.tolist()])
+        if buf is None:
+            self.write_batch(out)
         
     def clear_ram_defn(self, all_chan: bool = False) -> None:
         """Clear all pulse definitions in the FPGA
@@ -496,12 +710,16 @@ class QlaserFPGA:
         Args:
             all_chan (bool, optional): Clear all channels. Defaults to False.
         """
+        buf = bytearray()
         if all_chan:
             self.logger.debug("Clearing all channel's pulse definitions in the FPGA.")
-            self.ser.write('99'.encode('utf-8') + CMD_PULSE_CHSEL)
+            buf += _MSG_CHSEL_ALL
+            self._state["chsel"] = None
         
-        self.ser.write('0'.encode('utf-8') + CMD_MEM_CLR)
-        self.print_all(type="debug")  # flush out serial buffer
+        buf += _MSG_CLR_PDEFN
+        self.write_batch(buf)  # channel select and clear in one transfer
+        self._state["next_entry"] = 0
+        self.print_all(type="debug", wait=True)  # flush out serial buffer
         
     def clear_wave_table(self, all_chan: bool = True) -> None:
         """Clear all waveforms in the FPGA
@@ -509,12 +727,15 @@ class QlaserFPGA:
         Args:
             all_chan (bool, optional): Select all channels to clear. Defaults to True.
         """
+        buf = bytearray()
         if all_chan:
             self.logger.debug("Clearing all channel's waveforms in the FPGA.")
-            self.ser.write('99'.encode('utf-8') + CMD_PULSE_CHSEL)
+            buf += _MSG_CHSEL_ALL
+            self._state["next_entry"] = self._state["chsel"] = None
         
-        self.ser.write('1'.encode('utf-8') + CMD_MEM_CLR)
-        self.print_all(type="debug")
+        buf += _MSG_CLR_WAVE
+        self.write_batch(buf)  # channel select and clear in one transfer
+        self.print_all(type="debug", wait=True)
             
     
         
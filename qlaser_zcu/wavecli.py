@@ -1,32 +1,60 @@
 import os
-import pandas as pd  # for CSV processing
-from typing import Sequence
+import numpy as np
+from typing import Sequence, TYPE_CHECKING
 from .qlaser_fpga import QlaserFPGA, PulseConfig
-from .constants import *
+from .constants import C_BITS_ADDR_WAVE, C_LENGTH_WAVEFORM, DAC_BITS_RES, VOLTAGE_REF, VREF_INTERNAL
 from loguru import logger
 
+if TYPE_CHECKING:
+    import pandas as pd  # for CSV processing, imported where needed as it is slow to import
+
+_WAVETABLE_PATH = "data/wavetables.csv"
+
+# wave IDs and content of the database, cached against the file's modification time and size
+_wave_ids_cache: dict = {"key": None, "ids": []}
+_wavetable_cache: dict = {"key": None, "df": None}
+
+def _wavetable_key() -> tuple[int, int]:
+    """Modification time and size of the database, used to tell if a cached copy is stale."""
+    stat = os.stat(_WAVETABLE_PATH)
+    return stat.st_mtime_ns, stat.st_size
+
+def _load_wavetable() -> "pd.DataFrame":
+    """Read the database, reusing the frame of the last read or write while the file is unchanged on disk."""
+    import pandas as pd
+    key = _wavetable_key()
+    if _wavetable_cache["key"] != key:
+        _wavetable_cache["df"] = pd.read_csv(_WAVETABLE_PATH)
+        _wavetable_cache["key"] = key
+    return _wavetable_cache["df"]
+
 def get_wave_ids() -> list[int]:
-    """Get all wave IDs from the database
+    """Get all wave IDs from the database. Only the header of the database is read, and only again when it changed on disk.
 
     Returns:
         list[int]: List of wave IDs
     """
-    df = pd.read_csv("data/wavetables.csv")
-    return df.columns.astype(int).to_list() if not df.empty else []
+    key = _wavetable_key()
+    if _wave_ids_cache["key"] != key:
+        # the IDs are the header of the table, no need to parse the values below it
+        with open(_WAVETABLE_PATH) as f:
+            header = f.readline().strip().split(",")
+        _wave_ids_cache["ids"] = [int(h) for h in header if h]
+        _wave_ids_cache["key"] = key
+    return list(_wave_ids_cache["ids"])
 
-def get_wave(waveid: int, port: str | None = None) -> list[int]:
+def get_wave(waveid: int, port: str | None = None, fpga: QlaserFPGA | None = None) -> list[int]:
     """Get values of a waveform from the hardware with a known wave ID
 
     Args:
         waveid (int): Wave ID
         port (str | None, optional): Port to connect to FPGA. Defaults to None to auto-detect.
+        fpga (QlaserFPGA | None, optional): Open FPGA connection to reuse. Defaults to None to open a new one on `port`.
 
     Returns:
         list[int]: Wave values
     """
-    df = pd.read_csv("data/wavetables.csv")
-    
-    if waveid not in df.columns.astype(int).to_list():
+    if waveid not in get_wave_ids():
         logger.error(f"Waveform ID {waveid} not found in the database")
         raise ValueError(f"Waveform ID {waveid} not found in the database")
     
@@ -34,56 +62,76 @@ def get_wave(waveid: int, port: str | None = None) -> list[int]:
     length = waveid >> 16
     
     # read the waveform from the FPGA
-    return QlaserFPGA(portname=port).read_wave_table(start_addr, length)
+    fpga = fpga or QlaserFPGA(portname=port)
+    return fpga.read_wave_table(start_addr, length)
 
-def get_defns(channel: int, port: str | None = None) -> list[PulseConfig]:
+def get_defns(channel: int, port: str | None = None, fpga: QlaserFPGA | None = None) -> list[PulseConfig]:
     """Get pulse definitions from a channel
 
     Args:
         channel (int): Channel number (0-31)
         port (str | None, optional): Port to connect to FPGA. Defaults to None to auto-detect.
+        fpga (QlaserFPGA | None, optional): Open FPGA connection to reuse. Defaults to None to open a new one on `port`.
 
     Returns:
         list[PulseConfig]: Pulse definitions
     """
-    fpga = QlaserFPGA(portname=port)
+    fpga = fpga or QlaserFPGA(portname=port)
     fpga.chan_sel(channel)
     
     pdefs = fpga.read_pulse_defn()
     # convert the pulse definitions to a list of dictionaries
     pulse_defn = []
     for i in pdefs:
-        if (sum(list(i.values())) == 0):  # zero entry, stop
+        if not any(i.values()):  # zero entry, stop
             break
         pulse_defn.append(i)
 
     return pulse_defn
 
-def enable_channels(channels: list[int], port: str | None = None):
+def enable_channels(channels: list[int], port: str | None = None, fpga: QlaserFPGA | None = None):
     """Enable channels
 
     Args:
         channels (list[int]): List of channel numbers (0-31)
         port (str | None, optional): Port to connect to FPGA. Defaults to None to auto-detect.
+        fpga (QlaserFPGA | None, optional): Open FPGA connection to reuse. Defaults to None to open a new one on `port`.
     """
-    QlaserFPGA(portname=port).chan_en(channels)
+    fpga = fpga or QlaserFPGA(portname=port)
+    fpga.chan_en(channels)
 
-def add_wave(values: list[int], keep_previous: bool = True, port: str | None = None) -> int:
+def add_wave(values: Sequence[int] | np.ndarray, keep_previous: bool = True, port: str | None = None, fpga: QlaserFPGA | None = None) -> int:
     """Load a wave into the FPGA memory. Note that values must be DAC values between 0 and the maximum DAC value. Refer to your DAC's datasheet for voltage value to DAC value conversion.
+    If an identical wave is already in the wave table, its wave ID is returned and nothing is uploaded.
 
     Args:
-        values (list[int]): Wave values, must be in integers between 0 and maximum DAC value. Note that numpy integer types are not supported.
+        values (Sequence[int] | np.ndarray): Wave values, must be in integers between 0 and maximum DAC value. Lists and numpy integer arrays are both accepted.
         keep_previous (bool, optional): Keep previous wave table. Set this to False will clear both the database and data in the hardware. Defaults to True.
         port (str | None, optional): Port to connect to FPGA. Defaults to None to auto-detect.
+        fpga (QlaserFPGA | None, optional): Open FPGA connection to reuse. Defaults to None to open a new one on `port`.
 
     Returns:
         int: Wave ID
     """
-    fpga = QlaserFPGA(portname=port)
+    import pandas as pd
+
+    fpga = fpga or QlaserFPGA(portname=port)
+    # typed buffer shared by the database and the upload, saturated to the 16-bit sample range
+    wave = np.asarray(values)
+    max_val = (1 << C_BITS_ADDR_WAVE) - 1
+    if wave.size and (wave.min() < 0 or wave.max() > max_val):
+        logger.warning(f"Limiting wave values to 0 - {max_val}")
+    wave = np.clip(wave, 0, max_val).astype(np.uint16, copy=False)
     
     if keep_previous:
-        df = pd.read_csv("data/wavetables.csv").reset_index(drop=True)
-        last_id = df.columns.astype(int).to_list()[-1]
+        df = _load_wavetable()
+        wave_ids = df.columns.astype(int).to_list()
+        # Reuse an identical wave already in the wave table instead of uploading it again
+        for col, waveid in zip(df.columns, wave_ids):
+            if (waveid >> 16) == len(wave) and np.array_equal(df[col].to_numpy()[:len(wave)], wave):
+                logger.debug(f"Wave already loaded as {waveid}, reusing it")
+                return waveid
+        last_id = wave_ids[-1]
     else:
         df = pd.DataFrame()
         logger.info("Clearing FPGA wave table")
@@ -95,18 +143,22 @@ def add_wave(values: list[int], keep_previous: bool = True, port: str | None = N
     start_addr = start_addr + (start_addr % 2)
     
     # Check overflow
-    if start_addr + len(values) > C_LENGTH_WAVEFORM:
-        logger.error(f"Waveform RAM overflow. Start address {start_addr} + length {len(values)} > {C_LENGTH_WAVEFORM}")
-        raise MemoryError(f"Waveform RAM overflow. Start address {start_addr} + length {len(values)} > {C_LENGTH_WAVEFORM}")
+    if start_addr + len(wave) > C_LENGTH_WAVEFORM:
+        logger.error(f"Waveform RAM overflow. Start address {start_addr} + length {len(wave)} > {C_LENGTH_WAVEFORM}")
+        raise MemoryError(f"Waveform RAM overflow. Start address {start_addr} + length {len(wave)} > {C_LENGTH_WAVEFORM}")
 
-    waveid = len(values) << 16 | start_addr
+    waveid = len(wave) << 16 | start_addr
 
-    data = pd.Series(values, name=waveid, dtype=int)
+    data = pd.Series(wave, name=waveid, dtype=int)
     df = pd.concat([df, data], axis=1)
-    os.makedirs("data", exist_ok=True)  # Create data directory if it doesn't exist
-    df.to_csv("data/wavetables.csv", index=False)
+    os.makedirs(os.path.dirname(_WAVETABLE_PATH), exist_ok=True)  # Create data directory if it doesn't exist
+    df.to_csv(_WAVETABLE_PATH, index=False)
+    # keep the frame just written so the next call does not parse the file again
+    key = _wavetable_key()
+    _wavetable_cache.update(key=key, df=df)
+    _wave_ids_cache.update(key=key, ids=df.columns.astype(int).to_list())
     
-    fpga.write_wave_table(start_addr, values, all_chan=True)
+    fpga.write_wave_table(start_addr, wave, all_chan=True)
     logger.debug(f"Wave {waveid} loaded into FPGA at address {start_addr}")
         
     return waveid
@@ -117,6 +169,7 @@ def set_defns(
     channel: int,
     port: str | None = None,
     flush_type: str = "debug",
+    fpga: QlaserFPGA | None = None,
 ):
     """Load pulse definitions into the FPGA
 
@@ -125,13 +178,14 @@ def set_defns(
         seq_length (int): Total pulse sequence duation to run for **all** channels, in 10 ns.
         channel (int): Channel (0-31) to load the wave(s) into.
         port (str | None, optional): Port to connect to FPGA. Defaults to None to auto-detect.
-        flush_type (str, optional): FPGA seral output to log type. Either "info" or "debug". Defaults to "debug". 
+        flush_type (str, optional): FPGA seral output to log type. Either "info", "debug" or "none" to read it back without logging (errors are still logged). Defaults to "debug". 
+        fpga (QlaserFPGA | None, optional): Open FPGA connection to reuse. Defaults to None to open a new one on `port`.
     """
     # Make sure definitions param is a list
     if not isinstance(definitions, list):
         definitions = [definitions]
     
-    fpga = QlaserFPGA(portname=port)
+    fpga = fpga or QlaserFPGA(portname=port)
     
     fpga.set_seq(seq_length)
     fpga.chan_sel(channel)
@@ -140,21 +194,26 @@ def set_defns(
     fpga.clear_ram_defn(all_chan=False)
     fpga.print_all(type=flush_type)
     
-    for i, entry in enumerate(definitions):
-        logger.info(f"Loading wave {i} into FPGA")
-        fpga.entry_pulse_defn(
-            entry['wave_id'],
-            entry['start_time'],
-            entry['scale_gain'],
-            entry['scale_time'],
-            entry['sustain'],
-            n_entry = i
-        )
-    fpga.print_all(type=flush_type)  # flush output
+    # Encode every entry at once and send them all in one transfer
+    logger.info(f"Loading {len(definitions)} pulse definitions into FPGA")
+    fpga.entry_pulse_defn_bulk(
+        [entry['wave_id'] for entry in definitions],
+        [entry['start_time'] for entry in definitions],
+        [entry['scale_gain'] for entry in definitions],
+        [entry['scale_time'] for entry in definitions],
+        [entry['sustain'] for entry in definitions],
+    )
+    fpga.print_all(type=flush_type, wait=True)  # flush output
     
     # export the definitions to a CSV file
+    import pandas as pd
     pd.DataFrame(definitions).to_csv(f"data/definitions_channel{channel}.csv", index=False)
 
+def _dac_step(vref: float, vref_type: str) -> float:
+    """Voltage of one DAC code. The internal reference is doubled by the DAC's output gain."""
+    full_scale = 2.0 * vref if vref_type == VREF_INTERNAL else vref
+    return full_scale / (1 << DAC_BITS_RES)
+
 def vdac_to_hex(voltage: float, vref: float = VOLTAGE_REF, vref_type: str = VREF_INTERNAL) -> int:
     """Convert voltage to PMOD DAC code. Useful for setting DAC values for the "DC" voltages through the PMODs
 
@@ -166,30 +225,38 @@ def vdac_to_hex(voltage: float, vref: float = VOLTAGE_REF, vref_type: str = VREF
     Returns:
         int: DAC value
     """
-    # Limit input to be between zero and the reference voltage
-    if ((vref_type == VREF_INTERNAL) and (voltage > (2.0 * vref))):
-        logger.warning('Limiting max voltage to 2x internal vref: ' + str(2.0*vref))
-        voltage = 2.0 * vref
-
-    elif (vref_type == VREF_EXTERNAL) and (voltage > vref) :
-        logger.warning('Limiting max voltage to ext ref : ' + str(vref))
-        voltage = vref
-
-    elif (voltage < 0) :
-        logger.warning('Limiting min voltage to : 0.0')
-        voltage = 0.0
-        
-    # Convert voltage to DAC setting
-    if (vref_type == 'internal'):
-        step = 2.0 * vref / (2.0 ** DAC_BITS_RES)
-    else:
-        step = vref / (2.0 ** DAC_BITS_RES)
+    code_max = (1 << DAC_BITS_RES) - 1
+    step = _dac_step(vref, vref_type)
+    dac_code = int(voltage / step)
 
-    # Make DAC code
-    dac_code = int(voltage/step)
+    # Limit output to be between zero and the full scale of the reference voltage
+    if voltage < 0 or dac_code > code_max:
+        logger.warning(f"Limiting voltage {voltage} to 0 - {code_max * step}")
+        dac_code = min(max(dac_code, 0), code_max)
+
+    return dac_code
+
+def vdac_to_hex_vec(voltages: Sequence[float] | np.ndarray, vref: float = VOLTAGE_REF, vref_type: str = VREF_INTERNAL) -> np.ndarray:
+    """Convert many voltages to PMOD DAC codes at once. Vectorized version of :meth:`vdac_to_hex`, useful for updating several DC channels
+
+    Args:
+        voltages (Sequence[float] | np.ndarray): Voltages to convert
+        vref (float, optional): Reference voltage. Defaults to `VOLTAGE_REF`.
+        vref_type (str, optional): Reference voltage type. Defaults to `VREF_INTERNAL`.
+
+    Returns:
+        np.ndarray: DAC values
+    """
+    code_max = (1 << DAC_BITS_RES) - 1
+    step = _dac_step(vref, vref_type)
+    voltages = np.asarray(voltages, dtype=np.float64)
+    dac_codes = voltages / step
+    if not np.isfinite(voltages).all():
+        logger.warning("Replacing non-finite voltages, NaN with 0 and infinity with the nearest limit")
+        dac_codes = np.nan_to_num(dac_codes, nan=0.0)
 
-    if (dac_code > (2** DAC_BITS_RES) - 1): 
-        dac_code = (2**DAC_BITS_RES) - 1
-        logger.warning('Limiting max dac_code to : ' + hex(dac_code))
+    # Limit in float before converting, so out-of-range values cannot overflow the integer type
+    if np.any((voltages < 0) | (dac_codes >= code_max + 1)):
+        logger.warning(f"Limiting voltages to 0 - {code_max * step}")
 
-    return dac_code
\ No newline at end of file
+    return np.clip(dac_codes, 0, code_max).astype(np.int32)
@@ -0,0 +1,61 @@
+"""Serial port stand-in to test QlaserFPGA without hardware"""
+import itertools
+from unittest import mock
+
+from qlaser_zcu.constants import FPGA_VERSION, FIRMWARE_VERSION, CMD_VERSIONS
+from qlaser_zcu.qlaser_fpga import QlaserFPGA
+
+
+class FakeSerial:
+    """Records every write and answers a command with its canned response, keyed by the command byte"""
+    def __init__(self, port: str = None, **kwargs):
+        self.port = port
+        self.timeout = 0
+        self.written = bytearray()
+        self.rx = bytearray()
+        self.responses = {CMD_VERSIONS: f"FPGA {FPGA_VERSION}\r\nFirmware {FIRMWARE_VERSION}\r\n".encode()}
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.written += data
+        self.rx += self.responses.get(data[-1:], b"")
+        return len(data)
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self.rx)
+
+    def read(self, size: int = 1) -> bytes:
+        data = bytes(self.rx[:size])
+        del self.rx[:size]
+        return data
+
+    def readline(self) -> bytes:
+        end = self.rx.find(b"\n") + 1 or len(self.rx)
+        return self.read(end)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+_port_ids = itertools.count()
+
+
+def patch_serial():
+    """Patch serial.Serial so every QlaserFPGA opened in the context talks to its own FakeSerial"""
+    return mock.patch("qlaser_zcu.qlaser_fpga.serial.Serial", FakeSerial)
+
+
+def open_fpga(portname: str | None = None) -> QlaserFPGA:
+    """Open a QlaserFPGA on a FakeSerial, with the writes of the connection setup cleared
+
+    Args:
+        portname (str | None, optional): Port to connect to. Defaults to None for a new port no other connection has used.
+    """
+    with patch_serial():
+        fpga = QlaserFPGA(portname=portname or f"/dev/ttyFAKE{next(_port_ids)}")
+    fpga.ser.written.clear()
+    return fpga
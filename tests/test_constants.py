@@ -0,0 +1,19 @@
+import unittest
+
+from qlaser_zcu import constants
+
+
+class TestCommands(unittest.TestCase):
+    def test_commands_are_single_bytes(self):
+        """Every command is a single byte appended to the message as is"""
+        commands = {name: value for name, value in vars(constants).items()
+                    if name.startswith("CMD_") and name != "CMD_ERR_MSG"}
+        self.assertTrue(commands)
+        for name, value in commands.items():
+            with self.subTest(name=name):
+                self.assertIsInstance(value, bytes)
+                self.assertEqual(len(value), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
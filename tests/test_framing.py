@@ -0,0 +1,78 @@
+import unittest
+
+from qlaser_zcu.constants import CMD_PDEFN_WR, CMD_WAVERAM_WR, C_BITS_ADDR_WAVE
+from tests.fake_serial import open_fpga
+
+
+class TestPulseDefnFraming(unittest.TestCase):
+    """entry_pulse_defn_bulk must send the same bytes as one entry_pulse_defn per entry"""
+    def setUp(self):
+        self.fpga = open_fpga()
+        # The first start time is below the minimum and the last entry overflows every field
+        self.defns = [
+            (196608, 1, 1.0, 1.0, 5),
+            (262148, 128, 0.5, 2.0, 7),
+            (327684, 256, 1.25, 0.75, 0x1FFFF),
+            (0x7FFFFFFF, 0x1FFFFFF, 3.0, 300.0, 0x3FFFF),
+        ]
+
+    def expected(self, n_entry: int) -> bytearray:
+        buf = bytearray()
+        for i, defn in enumerate(self.defns):
+            self.fpga.entry_pulse_defn(*defn, n_entry=n_entry + i, buf=buf)
+        return buf
+
+    def test_bulk_matches_single_entries(self):
+        for n_entry in (0, 10):
+            buf = bytearray()
+            self.fpga.entry_pulse_defn_bulk(*zip(*self.defns), n_entry=n_entry, buf=buf)
+            self.assertEqual(buf, self.expected(n_entry))
+
+    def test_bulk_sends_buffer(self):
+        self.fpga.entry_pulse_defn_bulk(*zip(*self.defns))
+        self.assertEqual(self.fpga.ser.written, self.expected(0))
+
+    def test_single_entry_frames(self):
+        buf = bytearray()
+        self.fpga.entry_pulse_defn(196608, 10, 1.0, 1.0, 5, n_entry=2, buf=buf)
+        scale = (1 << 15 << 16) | (1 << 8)
+        frames = [(8 << 32) | 10, (9 << 32) | 196608, (10 << 32) | scale, (11 << 32) | 5]
+        self.assertEqual(buf, b"".join(b"%d" % frame + CMD_PDEFN_WR for frame in frames))
+
+
+class TestWaveTableFraming(unittest.TestCase):
+    """write_wave_table must send the same bytes as one xil_out32 per pair of values"""
+    def setUp(self):
+        self.fpga = open_fpga()
+
+    def expected(self, start_addr: int, values: list[int]) -> bytearray:
+        padded = values + [0] * (len(values) % 2)
+        buf = bytearray()
+        for i in range(0, len(padded), 2):
+            data = (padded[i + 1] << C_BITS_ADDR_WAVE) | padded[i]
+            self.fpga.xil_out32((start_addr + i) // 2, data, CMD_WAVERAM_WR, buf)
+        return buf
+
+    def test_even_length(self):
+        values = [0, 1, 0xFFFF, 0x1234, 7, 8]
+        waveid = self.fpga.write_wave_table(4, values)
+        self.assertEqual(self.fpga.ser.written, self.expected(4, values))
+        self.assertEqual(waveid, (len(values) << 16) | 4)
+
+    def test_odd_length_is_padded(self):
+        values = [10, 20, 30]
+        self.fpga.write_wave_table(100, values)
+        self.assertEqual(self.fpga.ser.written, self.expected(100, values))
+
+    def test_all_channels(self):
+        values = [1, 2]
+        self.fpga.write_wave_table(0, values, all_chan=True)
+        self.assertEqual(self.fpga.ser.written, b"99c" + self.expected(0, values))
+
+    def test_odd_start_address_is_rejected(self):
+        self.assertIsNone(self.fpga.write_wave_table(1, [1, 2]))
+        self.assertEqual(self.fpga.ser.written, b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from qlaser_zcu.constants import CMD_RD_PDEFN, CMD_RD_WAVE
+from tests.fake_serial import open_fpga
+
+
+class TestReadPulseDefn(unittest.TestCase):
+    def setUp(self):
+        self.fpga = open_fpga()
+
+    def read(self, response: bytes) -> list:
+        self.fpga.ser.responses[CMD_RD_PDEFN] = response
+        return self.fpga.read_pulse_defn()
+
+    def test_fields(self):
+        # gain 1.0 and time 1.0, then gain 0.5 and time 2.0
+        configs = self.read(b"5,196608,2147483904,5,128,262148,1073742336,7,\r\n")
+        self.assertEqual(configs, [
+            dict(wave_id=196608, start_time=5, scale_gain=1.0, scale_time=1.0, sustain=5),
+            dict(wave_id=262148, start_time=128, scale_gain=0.5, scale_time=2.0, sustain=7),
+        ])
+        self.assertEqual([type(v) for v in configs[0].values()], [int, int, float, float, int])
+
+    def test_fields_are_masked(self):
+        configs = self.read(b"16777221,1,0,262143\r\n")
+        self.assertEqual(configs, [dict(wave_id=1, start_time=5, scale_gain=0.0, scale_time=0.0, sustain=0x1FFFF)])
+
+    def test_malformed_groups_are_dropped_without_shifting(self):
+        configs = self.read(b"1,,2,3,abc,1,2,3,5,196608,2147483904,5,9,9\r\n")
+        self.assertEqual(configs, [dict(wave_id=196608, start_time=5, scale_gain=1.0, scale_time=1.0, sustain=5)])
+
+    def test_overlong_group_is_dropped_without_shifting(self):
+        configs = self.read(b"1,99999999999999999999,2,3,5,196608,2147483904,5\r\n")
+        self.assertEqual(configs, [dict(wave_id=196608, start_time=5, scale_gain=1.0, scale_time=1.0, sustain=5)])
+
+    def test_truncated_group_is_dropped(self):
+        self.assertEqual(self.read(b"5,196608,2147483904,5,6,7\r\n")[1:], [])
+        self.assertEqual(self.read(b"5,196608\r\n"), [])
+
+    def test_empty_response(self):
+        self.assertEqual(self.read(b"\r\n"), [])
+        self.assertEqual(self.read(b""), [])
+
+
+class TestReadWaveTable(unittest.TestCase):
+    def setUp(self):
+        self.fpga = open_fpga()
+
+    def read(self, response: bytes) -> list:
+        self.fpga.ser.responses[CMD_RD_WAVE] = response
+        return self.fpga.read_wave_table(0, 8)
+
+    def test_values(self):
+        self.assertEqual(self.read(b"1,2,3,65535,\r\n"), [1, 2, 3, 65535])
+
+    def test_malformed_tokens_are_skipped(self):
+        self.assertEqual(self.read(b"1,,x3,2, 7,4*E\r\n"), [1, 2])
+
+    def test_overlong_tokens_are_skipped(self):
+        self.assertEqual(self.read(b"1,99999999999999999999,4294967295,2\r\n"), [1, 4294967295, 2])
+
+    def test_empty_response(self):
+        self.assertEqual(self.read(b""), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+
+from qlaser_zcu import wavecli
+from qlaser_zcu.constants import CMD_PULSE_CHEN, CMD_PULSE_CHSEL, CMD_RD_PDEFN, CMD_REG_DUMP
+from tests.fake_serial import open_fpga, patch_serial
+
+
+class TestSharedPortState(unittest.TestCase):
+    """The FPGA holds channel select and enable once per port, so every connection to the port must see changes"""
+    def setUp(self):
+        self.fpga = open_fpga()
+        self.port = self.fpga.ser.port
+
+    def test_chan_sel_after_other_connection(self):
+        self.fpga.chan_sel(1)
+        with patch_serial():
+            wavecli.get_defns(2, port=self.port)
+        self.fpga.ser.written.clear()
+        self.fpga.chan_sel(1)
+        self.assertEqual(self.fpga.ser.written, b"2" + CMD_PULSE_CHSEL)
+
+    def test_chan_en_after_other_connection(self):
+        self.fpga.chan_en([0, 1])
+        with patch_serial():
+            wavecli.enable_channels([2], port=self.port)
+        self.fpga.ser.written.clear()
+        self.fpga.chan_en([0, 1])
+        self.assertEqual(self.fpga.ser.written, b"3" + CMD_PULSE_CHEN)
+
+    def test_repeated_select_is_skipped(self):
+        self.fpga.chan_sel(1)
+        self.fpga.chan_en([0, 1])
+        other = open_fpga(self.port)
+        other.chan_sel(1)
+        other.chan_en([0, 1])
+        self.assertEqual(other.ser.written, b"")
+
+    def test_other_ports_are_independent(self):
+        self.fpga.chan_sel(1)
+        other = open_fpga()
+        other.chan_sel(1)
+        self.assertEqual(other.ser.written, b"2" + CMD_PULSE_CHSEL)
+
+
+class TestReadEnabled(unittest.TestCase):
+    """chan_en after read_en skips only a request matching the mask the hardware reported"""
+    def setUp(self):
+        self.fpga = open_fpga()
+
+    def read_en(self, mask: int) -> list[int]:
+        self.fpga.ser.responses[CMD_REG_DUMP] = b"ADR_PULSE_REG_CHEN 0x%08X\r\n" % mask
+        channels = self.fpga.read_en()
+        self.fpga.ser.written.clear()
+        return channels
+
+    def test_matching_mask_is_skipped(self):
+        self.assertEqual(self.read_en(0x6), [1, 2])
+        self.fpga.chan_en([1, 2])
+        self.assertEqual(self.fpga.ser.written, b"")
+
+    def test_other_mask_is_sent(self):
+        self.read_en(0x6)
+        self.fpga.chan_en([1])
+        self.assertEqual(self.fpga.ser.written, b"2" + CMD_PULSE_CHEN)
+
+    def test_hardware_mask_replaces_last_request(self):
+        self.fpga.chan_en([1, 2])
+        self.read_en(0x2)  # changed behind this connection, e.g. by a reset from another program
+        self.fpga.chan_en([1, 2])
+        self.assertEqual(self.fpga.ser.written, b"6" + CMD_PULSE_CHEN)
+
+
+class TestNextEntry(unittest.TestCase):
+    """Automatic pulse entries follow the last written entry of the port, and read back once it is unknown"""
+    defn = (196608, 10, 1.0, 1.0, 5)
+
+    def setUp(self):
+        self.fpga = open_fpga()
+        self.fpga.chan_sel(0)
+        self.fpga.clear_ram_defn()
+        self.fpga.entry_pulse_defn(*self.defn)
+
+    def assert_next_entry(self, n_entry: int):
+        """The next automatic entry is n_entry, without reading the pulse definitions back"""
+        self.fpga.ser.written.clear()
+        self.fpga.entry_pulse_defn(*self.defn)
+        buf = bytearray()
+        self.fpga.entry_pulse_defn(*self.defn, n_entry=n_entry, buf=buf)
+        self.assertEqual(self.fpga.ser.written, buf)
+
+    def assert_read_back(self):
+        self.fpga.ser.written.clear()
+        self.fpga.entry_pulse_defn(*self.defn)
+        self.assertIn(CMD_RD_PDEFN, self.fpga.ser.written)
+
+    def test_follows_last_entry(self):
+        self.assert_next_entry(1)
+        self.assert_next_entry(2)
+
+    def test_follows_other_connection(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp, patch_serial():
+            os.chdir(tmp)
+            try:
+                os.mkdir("data")
+                config = dict(wave_id=196608, start_time=10, scale_gain=1.0, scale_time=1.0, sustain=5)
+                wavecli.set_defns([config] * 3, 100, 0, port=self.fpga.ser.port)
+            finally:
+                os.chdir(cwd)
+        self.assert_next_entry(3)
+
+    def test_clear_restarts_at_first_entry(self):
+        self.fpga.clear_ram_defn()
+        self.assert_next_entry(0)
+
+    def test_chan_sel_reads_back(self):
+        self.fpga.chan_sel(1)
+        self.assert_read_back()
+
+    def test_reset_reads_back(self):
+        self.fpga.reset()
+        self.fpga.chan_sel(0)
+        self.assert_read_back()
+
+    def test_all_channel_writes_read_back(self):
+        for select_all in (lambda: self.fpga.clear_wave_table(all_chan=True),
+                           lambda: self.fpga.write_wave_table(0, [1, 2], all_chan=True)):
+            with self.subTest(select_all=select_all):
+                self.fpga.chan_sel(0)
+                self.fpga.clear_ram_defn()
+                select_all()
+                self.fpga.chan_sel(0)
+                self.assert_read_back()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from qlaser_zcu import wavecli
+from tests.fake_serial import open_fpga
+
+
+class TestWaveTable(unittest.TestCase):
+    """add_wave and get_wave_ids against the wave table database in a temporary working directory"""
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.mkdir("data")
+        wavecli._wave_ids_cache.update(key=None, ids=[])
+        wavecli._wavetable_cache.update(key=None, df=None)
+        self.fpga = open_fpga()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write_table(self, text: str):
+        with open(wavecli._WAVETABLE_PATH, "w") as f:
+            f.write(text)
+
+    def add_wave(self, values: list[int], keep_previous: bool = True) -> int:
+        self.fpga.ser.written.clear()
+        return wavecli.add_wave(values, keep_previous=keep_previous, fpga=self.fpga)
+
+    def test_duplicate_wave_is_reused(self):
+        waveid = self.add_wave([1, 2, 3, 4], keep_previous=False)
+        self.assertEqual(self.add_wave([1, 2, 3, 4]), waveid)
+        self.assertEqual(self.fpga.ser.written, b"")
+        self.assertEqual(wavecli.get_wave_ids(), [waveid])
+
+    def test_same_length_different_values_is_uploaded(self):
+        first = self.add_wave([1, 2, 3, 4], keep_previous=False)
+        second = self.add_wave([1, 2, 3, 5])
+        self.assertEqual(second, (4 << 16) | 4)
+        self.assertNotEqual(self.fpga.ser.written, b"")
+        self.assertEqual(wavecli.get_wave_ids(), [first, second])
+
+    def test_outside_rewrite_refreshes_caches(self):
+        self.add_wave([1, 2, 3, 4], keep_previous=False)
+        self.write_table("131072\n7\n8\n")
+        self.assertEqual(wavecli.get_wave_ids(), [131072])
+        self.assertEqual(self.add_wave([7, 8]), 131072)
+        self.assertEqual(self.fpga.ser.written, b"")
+        self.assertEqual(self.add_wave([1, 2, 3, 4]), (4 << 16) | 2)
+        self.assertNotEqual(self.fpga.ser.written, b"")
+
+    def test_empty_file(self):
+        self.write_table("")
+        self.assertEqual(wavecli.get_wave_ids(), [])
+
+    def test_header_only(self):
+        self.write_table("196608\n")
+        self.assertEqual(wavecli.get_wave_ids(), [196608])
+
+
+if __name__ == "__main__":
+    unittest.main()